@@ -1,26 +1,23 @@
 import streamlit as st
-import json
-import logging
-import os
-import sys
-import time
-import uuid
-import requests
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
-from datetime import datetime, timedelta, timezone
-import base64
-from dotenv import load_dotenv
+from datetime import datetime, timezone
+
+from maria_core import (
+    Settings,
+    SynthesisError,
+    create_job_id,
+    fetch_outputs,
+    generate_filename,
+    generate_srt,
+    get_storage,
+    index_tags,
+    principal_from_headers,
+    save_srt_file,
+    submit_synthesis,
+    wait_for_synthesis,
+)
 
 # Load environment variables
-load_dotenv(override=True)
-
-# Accessing environment variables
-SPEECH_ENDPOINT = os.getenv("SPEECH_ENDPOINT")
-SUBSCRIPTION_KEY = os.getenv("SUBSCRIPTION_KEY")
-BLOB_CONNECTION_STRING = os.getenv("BLOB_CONNECTION_STRING")
-BLOB_CONTAINER_NAME = os.getenv("BLOB_CONTAINER_NAME")
-API_VERSION = os.getenv("API_VERSION")
-BACKGROUND_IMAGE_URL = os.getenv("BACKGROUND_IMAGE_URL")
+settings = Settings.from_env()
 
 # Set up the page configuration
 st.set_page_config(page_title="Azure AI Text-to-Speech Avatar", layout="wide")
@@ -71,225 +68,132 @@ else:
 st.subheader("Input Text (Text to Speech)")
 input_text = st.text_area("Input Text", value=default_input_text)
 
-blob_service_client = BlobServiceClient.from_connection_string(BLOB_CONNECTION_STRING)
-container_client = blob_service_client.get_container_client(BLOB_CONTAINER_NAME)
-
-if 'video_history' not in st.session_state:
-    st.session_state['video_history'] = []
-
-def _create_job_id():
-    return str(uuid.uuid4())
-
-def _authenticate(subscription_key):
-    return {'Ocp-Apim-Subscription-Key': subscription_key}
-
-def check_existing_files(username, industry_vertical, customer_name, file_type):
-    file_prefix = f"{username}_{industry_vertical}_{customer_name}_Maria_{file_type}"
-    existing_files = container_client.list_blobs(name_starts_with=file_prefix)
-    count = 1
-    for blob in existing_files:
-        blob_name = blob.name
-        parts = blob_name.split("_")
-        if len(parts) >= 4 and parts[-1].startswith(file_type):
-            number_part = parts[-1].replace(file_type, "").replace(".mp4", "").replace(".webm", "").replace(".txt", "")
-            try:
-                number = int(number_part)
-                if number >= count:
-                    count = number + 1
-            except ValueError:
-                continue
-    return count
-
-def generate_sas_token(blob_name):
-    sas_token = generate_blob_sas(
-        account_name=blob_service_client.account_name,
-        container_name=BLOB_CONTAINER_NAME,
-        blob_name=blob_name,
-        account_key=blob_service_client.credential.account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=datetime.now(timezone.utc) + timedelta(hours=1)
-    )
-    return sas_token
-
-def submit_synthesis(job_id: str, input_text: str):
-    url = f'{SPEECH_ENDPOINT}/avatar/batchsyntheses/{job_id}?api-version={API_VERSION}'
-    header = {'Content-Type': 'application/json'}
-    header.update(_authenticate(SUBSCRIPTION_KEY))
-
-    payload = {
-        'synthesisConfig': {
-            "voice": 'Marie_ProNeural',
-            # Add word boundary data for timestamping
-            "outputFormat": "riff-24khz-16bit-mono-pcm",
-            "wordBoundary": True  # This adds word-level timestamping
-        },
-        'customVoices': {
-            "Marie_ProNeural": ""
-        },
-        "inputKind": "plainText",
-        "inputs": [
-            {"content": input_text},
-        ],
-        "avatarConfig": {
-            "customized": True,
-            "talkingAvatarCharacter": '',
-            "talkingAvatarStyle": '',
-            "videoFormat": "mp4",
-            "videoCodec": "h264",
-            "subtitleType": "hard_embedded",
-            "backgroundColor": "#FFFFFFFF",
-            "backgroundImage": BACKGROUND_IMAGE_URL
-        }
-    }
-
-    response = requests.put(url, json=payload, headers=header)
-    if response.status_code < 400:
-        return response.json()["id"]
-    else:
-        st.error(f'Failed to submit job: {response.text}')
-        return None
-
-def get_synthesis(job_id):
-    """Check the status of the synthesis job and get the video URL once it's complete."""
-    url = f'{SPEECH_ENDPOINT}/avatar/batchsyntheses/{job_id}?api-version={API_VERSION}'
-    header = _authenticate(SUBSCRIPTION_KEY)
-
-    try:
-        response = requests.get(url, headers=header)
-        response.raise_for_status()
-
-        response_data = response.json()
-
-        if response_data['status'] == 'Succeeded':
-            return response_data['outputs']['result'], response_data  # Return both the video URL and the entire response data
-        else:
-            return None, None
-    except Exception as e:
-        st.error(f"Failed to get job status: {str(e)}")
-        return None, None
+# Shared by every rerun and session in this process
+storage = get_storage(settings.blob_connection_string, settings.blob_container_name, settings.blob_account_url)
+HISTORY_PAGE_SIZE = 20
 
-def upload_to_blob(local_filename, blob_name):
-    blob_client = container_client.get_blob_client(blob_name)
-    with open(local_filename, "rb") as data:
-        blob_client.upload_blob(data)
-    return blob_client.url
+# Persistent history belongs to the signed-in identity; the Username box only names files
+history_owner = principal_from_headers(settings, st.context.headers)
+video_owner = history_owner or username
 
-def generate_filename(username, industry_vertical, customer_name, count, extension, file_type):
-    return f"{username}_{industry_vertical}_{customer_name}_Maria_{file_type}{count}.{extension}"
-
-def generate_srt(subtitle_data):
-    """
-    Generate SRT file content from the subtitle data.
-    """
-    srt_content = ""
-    for idx, entry in enumerate(subtitle_data):
-        start_time = format_srt_time(entry['start_time'])
-        end_time = format_srt_time(entry['end_time'])
-        srt_content += f"{idx+1}\n"
-        srt_content += f"{start_time} --> {end_time}\n"
-        srt_content += f"{entry['text']}\n\n"
-    return srt_content
-
-def save_srt_file(srt_content, srt_filename):
-    with open(srt_filename, 'w', encoding='utf-8') as srt_file:
-        srt_file.write(srt_content)
-    return srt_filename
-
-import subprocess
-
-def format_srt_time(milliseconds):
-    """
-    Convert milliseconds to SRT time format (hh:mm:ss,ms).
-    """
-    seconds, ms = divmod(milliseconds, 1000)
-    minutes, seconds = divmod(seconds, 60)
-    hours, minutes = divmod(minutes, 60)
-    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02},{int(ms):03}"
-
-def extract_word_timestamps(response_data):
-    """Extract word-level timestamps from Azure Speech synthesis response data."""
-    word_timestamps = []
-    if 'wordBoundary' in response_data:
-        for word_info in response_data['wordBoundary']:
-            word_timestamps.append({
-                'start_time': word_info['start'],
-                'end_time': word_info['end'],
-                'text': word_info['word']
-            })
-    return word_timestamps
+file_prefix = f"{username}_{industry_vertical}_{customer_name}"
 
 # Streamlit button to submit the job
 if st.button("Submit for Synthesis"):
     if not username or not input_text or not customer_name:
         st.warning("Please enter username, text, and customer name.")
     else:
-        job_id = _create_job_id()
-        recording_count = check_existing_files(username, industry_vertical, customer_name, "recordings")
-        
+        job_id = create_job_id()
+        recording_count = storage.next_recording_number(video_owner, customer_name, industry_vertical)
+
         # Submit the synthesis job
-        if submit_synthesis(job_id, input_text):
+        try:
+            submitted = submit_synthesis(settings, job_id, input_text, voice='Marie_ProNeural',
+                                         custom_voices={"Marie_ProNeural": ""})
+        except SynthesisError as e:
+            st.error(f'Failed to submit job: {e}')
+            submitted = None
+        if submitted:
             st.write(f"Job ID: {job_id}")
             with st.spinner("Waiting for job to complete..."):
-                while True:
-                    # Call get_synthesis and capture both the download URL and response data
-                    download_url, response_data = get_synthesis(job_id)
-                    
-                    if download_url and response_data:
-                        st.success("Job completed successfully!")
-
-                        video_name = generate_filename(username, industry_vertical, customer_name, recording_count, "mp4", "recordings")
-                        local_video_path = video_name
-
-                        with requests.get(download_url, stream=True) as r:
-                            r.raise_for_status()
-                            with open(local_video_path, 'wb') as f:
-                                for chunk in r.iter_content(chunk_size=8192):
-                                    f.write(chunk)
-
-                        # Generate and save the SRT file
-                        subtitle_data = extract_word_timestamps(response_data)
+                try:
+                    # 60 attempts * 5 seconds = 5 minutes timeout
+                    _, response_data = wait_for_synthesis(
+                        settings, job_id, max_attempts=60,
+                        on_error=lambda e: st.error(f"Failed to get job status: {str(e)}")
+                    )
+                except (SynthesisError, TimeoutError) as e:
+                    st.error(str(e))
+                else:
+                    st.success("Job completed successfully!")
+
+                    video_name = generate_filename(file_prefix, "recordings", recording_count, "mp4")
+
+                    # Download the video and word boundaries in parallel
+                    local_video_path, subtitle_data, subtitle_error = fetch_outputs(response_data, video_name)
+
+                    # Generate and save the SRT file
+                    if subtitle_error:
+                        st.warning(f"Subtitles could not be generated: {subtitle_error}")
+                    else:
                         srt_content = generate_srt(subtitle_data)
                         srt_filename = f"{video_name}.srt"
                         save_srt_file(srt_content, srt_filename)
 
-                        blob_url = upload_to_blob(local_video_path, video_name)
-                        st.session_state['video_history'].append({
-                            "name": video_name,
-                            "url": blob_url,
-                            "sas_token": generate_sas_token(video_name)
-                        })
-
-                        st.download_button(
-                            label="Download Video",
-                            data=open(local_video_path, 'rb'),
-                            file_name=video_name,
-                            mime='video/mp4'
-                        )
-
-                        break
-                    time.sleep(5)
+                    blob_name, blob_url = storage.upload_video(
+                        local_video_path, video_name, video_owner, customer_name, industry_vertical
+                    )
+                    st.session_state.pop('history_page', None)
+                    st.session_state.setdefault('session_videos', []).insert(0, {
+                        "name": blob_name,
+                        "display_name": video_name,
+                        "url": blob_url,
+                        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    })
+
+                    st.download_button(
+                        label="Download Video",
+                        data=open(local_video_path, 'rb'),
+                        file_name=video_name,
+                        mime='video/mp4'
+                    )
 
 # Feedback input
 st.subheader("Feedback")
 feedback = st.text_area("Please provide feedback if you have any suggestions for improvement.")
 
 if feedback and st.button("Submit Feedback"):
-    feedback_count = check_existing_files(username, industry_vertical, customer_name, "feedback")
-    feedback_filename = generate_filename(username, industry_vertical, customer_name, feedback_count, "txt", "feedback")
-    feedback_blob_client = container_client.get_blob_client(feedback_filename)
-    feedback_blob_client.upload_blob(feedback)
+    feedback_count = storage.check_existing_files(file_prefix, "feedback")
+    feedback_filename = generate_filename(file_prefix, "feedback", feedback_count, "txt")
+    storage.upload_text(feedback, feedback_filename,
+                        tags=index_tags("feedback", video_owner, customer_name, industry_vertical))
     st.success(f"Thank you for your feedback! It has been saved as {feedback_filename}.")
 
-# Display session video history
-st.subheader("Session Video History")
-for video in st.session_state['video_history']:
-    video_sas_url = f"{video['url']}?{video['sas_token']}"
-    st.write(f"{video['name']} - [Download]({video_sas_url})")
+# Video history. Signed-in users get their persistent history from the blob index, one
+# page at a time; otherwise only videos created in this browser session are listed, so
+# typing someone else's name into "Username" never exposes their videos.
+st.subheader("Video History")
+if history_owner:
+    if st.session_state.get('history_user') != history_owner:
+        st.session_state['history_user'] = history_owner
+        st.session_state['history_page_tokens'] = [None]
+    page_tokens = st.session_state['history_page_tokens']
+    # Only query the blob index when the page changes; uploads clear this cache
+    history_key = (history_owner, page_tokens[-1])
+    cached_page = st.session_state.get('history_page')
+    if cached_page is None or cached_page[0] != history_key:
+        cached_page = (history_key,) + storage.list_history(
+            history_owner, page_size=HISTORY_PAGE_SIZE, continuation_token=page_tokens[-1]
+        )
+        st.session_state['history_page'] = cached_page
+    _, history_rows, next_page_token = cached_page
+else:
+    st.caption("Sign in to see your full history. Showing videos created in this session.")
+    page_tokens = [None]
+    history_rows, next_page_token = st.session_state.get('session_videos', []), None
+if not history_rows:
+    st.write("No videos yet.")
+for video in history_rows:
+    # SAS tokens are only signed for the rows on the current page
+    video_sas_url = f"{video['url']}?{storage.generate_sas_token(video['name'])}"
+    st.write(f"{video['display_name']} ({video['created']}) - [Download]({video_sas_url})")
+prev_col, next_col = st.columns(2)
+if len(page_tokens) > 1 and prev_col.button("Previous Page"):
+    page_tokens.pop()
+    st.rerun()
+if next_page_token and next_col.button("Next Page"):
+    page_tokens.append(next_page_token)
+    st.rerun()
 
 # Reset session button
 if st.button("Reset Session"):
-    st.session_state['video_history'] = []
-    st.success("Session reset successfully. All session video history cleared.")
+    st.session_state['history_page_tokens'] = [None]
+    st.session_state.pop('history_page', None)
+    st.session_state['session_videos'] = []
+    st.session_state['history_reset'] = True
+    st.rerun()
+if st.session_state.pop('history_reset', False):
+    st.success("Session reset successfully. Video history is back on the first page.")
 
 # Add a horizontal line for separation
 st.markdown("---")
@@ -1,29 +1,29 @@
 import streamlit as st
-import json
-import logging
-import os
-import sys
-import time
-import uuid
-import requests
-import asyncio
-import nest_asyncio
-
-from datetime import datetime, timedelta, timezone
-import base64
+from datetime import datetime, timezone
+from urllib.parse import urlencode
 
 # Optional: load environment variables from a .env file if needed
 # from dotenv import load_dotenv
 # load_dotenv(override=True)
 
-# Semantic Kernel imports
-from semantic_kernel import Kernel
-from semantic_kernel.agents import ChatCompletionAgent
-from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
-from semantic_kernel.contents import ChatHistory, ChatMessageContent
-from semantic_kernel.contents.utils.author_role import AuthorRole
-
-nest_asyncio.apply()
+from maria_core import (
+    SearchError,
+    Settings,
+    SynthesisError,
+    bing_search,
+    create_job_id,
+    fetch_outputs,
+    generate_filename,
+    get_prefetcher,
+    get_storage,
+    index_tags,
+    principal_from_headers,
+    is_approved,
+    research_query,
+    submit_synthesis,
+    summarize_and_review,
+    wait_for_synthesis,
+)
 
 ###################################
 # CONFIGURATION
@@ -50,6 +50,26 @@ AZURE_OPENAI_API_VERSION = "YOUR_AZURE_OPENAI_API_VERSION"
 BING_SEARCH_ENDPOINT = "https://api.bing.microsoft.com/v7.0/search"
 BING_SEARCH_API_KEY = "YOUR_BING_SEARCH_API_KEY"
 
+# Set to True only when deployed behind Azure App Service authentication (Easy Auth);
+# persistent video history is keyed on the identity it provides
+TRUST_AUTH_HEADERS = False
+
+settings = Settings(
+    speech_endpoint=SPEECH_ENDPOINT,
+    subscription_key=SUBSCRIPTION_KEY,
+    api_version=API_VERSION,
+    background_image_url=BACKGROUND_IMAGE_URL,
+    blob_connection_string=BLOB_CONNECTION_STRING,
+    blob_container_name=BLOB_CONTAINER_NAME,
+    azure_openai_api_key=AZURE_OPENAI_API_KEY,
+    azure_openai_endpoint=AZURE_OPENAI_ENDPOINT,
+    azure_openai_deployment_name=AZURE_OPENAI_DEPLOYMENT_NAME,
+    azure_openai_api_version=AZURE_OPENAI_API_VERSION,
+    bing_search_endpoint=BING_SEARCH_ENDPOINT,
+    bing_search_api_key=BING_SEARCH_API_KEY,
+    trust_auth_headers=TRUST_AUTH_HEADERS,
+)
+
 ###################################
 # STREAMLIT PAGE CONFIG
 ###################################
@@ -106,116 +126,41 @@ with st.sidebar:
         index=0
     )
 
-###################################
-# AGENT DEFINITIONS
-###################################
-
-# Step A) SearchAgent: queries Bing
-def bing_search(query: str) -> str:
-    """Queries Bing for the given text and returns snippet data."""
-    if not BING_SEARCH_API_KEY or "YOUR_BING_SEARCH_API_KEY" in BING_SEARCH_API_KEY:
-        return "**ERROR**: Bing Search API key not found. Provide BING_SEARCH_API_KEY in your configuration."
-    headers = {"Ocp-Apim-Subscription-Key": BING_SEARCH_API_KEY}
-    params = {"q": query, "count": 2}
-    try:
-        response = requests.get(BING_SEARCH_ENDPOINT, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-        results_text = ""
-        if "webPages" in data and "value" in data["webPages"]:
-            for item in data["webPages"]["value"]:
-                snippet = item.get("snippet", "")
-                results_text += snippet + "\n"
-        else:
-            results_text = "No Bing results found."
-        return results_text.strip()
-    except Exception as e:
-        return f"Bing API call failed: {str(e)}"
-
-def create_summarizer_agent():
-    """
-    Agent that takes the Bing search results (around 200 words) as input and summarizes them into a concise summary of 100–150 words.
-    The summary must mention only the customer's name (from user input) and Microsoft.
-    """
-    kernel = Kernel()
-    azure_chat = AzureChatCompletion(
-        service_id="summarizer_service",
-        api_key=AZURE_OPENAI_API_KEY,
-        endpoint=AZURE_OPENAI_ENDPOINT,
-        deployment_name=AZURE_OPENAI_DEPLOYMENT_NAME,
-        api_version=AZURE_OPENAI_API_VERSION
-    )
-    kernel.add_service(azure_chat)
-    instructions = (
-        "You are SummarizerAgent. Given the Bing search results provided (approximately 200 words), summarize the information into a concise summary of 100 to 150 words. "
-        "The summary must mention only the customer's name (from user input) and Microsoft, and exclude any other brands or competitors. "
-        "Focus on the customer's history, vision, products, and services."
-    )
-    summarizer_agent = ChatCompletionAgent(
-        service_id="summarizer_service",
-        kernel=kernel,
-        name="SummarizerAgent",
-        instructions=instructions
-    )
-    return summarizer_agent
-
-def create_manager_agent(customer_name: str):
-    """Agent that checks the summary for unwanted brand names and approves or requests changes."""
-    kernel = Kernel()
-    azure_chat = AzureChatCompletion(
-        service_id="manager_service",
-        api_key=AZURE_OPENAI_API_KEY,
-        endpoint=AZURE_OPENAI_ENDPOINT,
-        deployment_name=AZURE_OPENAI_DEPLOYMENT_NAME,
-        api_version=AZURE_OPENAI_API_VERSION
+    st.header("Research Options")
+    speculative_research = st.checkbox(
+        "Prefetch research when a customer name is entered",
+        value=False,
+        help="Runs the Bing search and agent review in the background so the buttons below return instantly. "
+             "Requires a username; limited to a few runs per user per hour."
     )
-    kernel.add_service(azure_chat)
-    manager_instructions = (
-        f"You are ManagerAgent. Check the summary provided by SummarizerAgent to ensure:\n"
-        f"1) Only the customer's name '{customer_name}' and 'Microsoft' are mentioned.\n"
-        "2) The summary is within 100 to 150 words.\n"
-        "3) If the summary is acceptable, respond 'approved'. Otherwise, indicate what needs to be changed."
-    )
-    manager_agent = ChatCompletionAgent(
-        service_id="manager_service",
-        kernel=kernel,
-        name="ManagerAgent",
-        instructions=manager_instructions
-    )
-    return manager_agent
 
-async def run_summarizer_manager_chain(customer_name: str, raw_text: str) -> (str, str, str):
-    """
-    1) SummarizerAgent processes the Bing search results.
-    2) ManagerAgent checks the resulting summary.
-    Returns (summarizer_output, manager_output, conversation).
-    """
-    conversation_log = []
-    
-    # Summarizer
-    summarizer_agent = create_summarizer_agent()
-    sum_history = ChatHistory()
-    sum_history.add_message(ChatMessageContent(role=AuthorRole.SYSTEM, content=summarizer_agent.instructions))
-    sum_history.add_user_message(raw_text)
-    summarizer_output = ""
-    async for msg in summarizer_agent.invoke(sum_history):
-        summarizer_output = msg.content
-        sum_history.add_message(msg)
-        conversation_log.append(f"[Summarizer] {msg.content}")
-    
-    # Manager
-    manager_agent = create_manager_agent(customer_name)
-    manager_history = ChatHistory()
-    manager_history.add_message(ChatMessageContent(role=AuthorRole.SYSTEM, content=manager_agent.instructions))
-    manager_history.add_user_message(summarizer_output)
-    manager_output = ""
-    async for msg in manager_agent.invoke(manager_history):
-        manager_output = msg.content
-        manager_history.add_message(msg)
-        conversation_log.append(f"[Manager] {msg.content}")
-    
-    full_convo = "\n".join(conversation_log)
-    return summarizer_output, manager_output, full_convo
+###################################
+# SPECULATIVE PREFETCH
+###################################
+# How long the buttons wait for prefetched work before doing it themselves
+PREFETCH_SEARCH_WAIT_SECONDS = 5
+PREFETCH_CHAIN_WAIT_SECONDS = 30
+
+# A click on either research button must never trigger a retry; the button does the work itself
+research_clicked = st.session_state.get("fetch_bing_data") or st.session_state.get("summarize_approve")
+
+speculation = None
+if username:
+    prefetcher = get_prefetcher(settings)
+    if speculative_research and customer_name:
+        speculation = prefetcher.request(username, customer_name, allow_retry=not research_clicked)
+    else:
+        prefetcher.cancel(username)
+    if speculation:
+        with st.sidebar:
+            if speculation.status == "over_budget":
+                st.caption("Prefetch budget used up for now; use the buttons as usual.")
+            elif speculation.status == "failed":
+                st.caption("Prefetch failed; use the buttons as usual.")
+            elif speculation.in_progress:
+                st.caption(f"Prefetching research for {customer_name}...")
+            elif speculation.status == "done":
+                st.caption(f"Research for {customer_name} is ready.")
 
 ###########################
 #  UI - BING + SUMMARIZE
@@ -228,31 +173,45 @@ bing_col, summary_col = st.columns(2)
 
 with bing_col:
     st.write("**Step A: Bing Search**")
-    if st.button("Fetch Bing Data"):
+    if st.button("Fetch Bing Data", key="fetch_bing_data"):
         if not customer_name:
             st.warning("Please enter a Customer Name in the sidebar.")
         else:
-            query = f"{customer_name} history, recent recognition, products and services"
+            query = research_query(customer_name)
             st.info(f"Searching: {query}")
-            data_found = bing_search(query)
-            st.write("**Bing Data**:")
-            st.write(data_found)
-            st.session_state["bing_data"] = data_found
+            data_found = None
+            if speculation:
+                # Pick up the prefetched search, waiting for it if it is still running
+                with st.spinner("Waiting for prefetched search..."):
+                    data_found = speculation.wait_for_search(timeout=PREFETCH_SEARCH_WAIT_SECONDS)
+            try:
+                if data_found is None:
+                    data_found = bing_search(settings, query)
+            except SearchError as e:
+                st.error(f"**ERROR**: {e}")
+            else:
+                st.write("**Bing Data**:")
+                st.write(data_found or "No Bing results found.")
+                st.session_state["bing_data"] = data_found
 
 with summary_col:
     st.write("**Step B & C: Summarize & Manager Check**")
-    if st.button("Summarize & Approve?"):
+    if st.button("Summarize & Approve?", key="summarize_approve"):
         if "bing_data" not in st.session_state or not st.session_state["bing_data"].strip():
             st.warning("No Bing data found. Fetch data first!")
         else:
             with st.spinner("Summarizing & Manager Checking..."):
-                loop = asyncio.get_event_loop()
-                sum_out, mgr_out, convo = loop.run_until_complete(
-                    run_summarizer_manager_chain(customer_name, st.session_state["bing_data"])
-                )
+                chain_result = None
+                if speculation and speculation.bing_data == st.session_state["bing_data"]:
+                    chain_result = speculation.wait(timeout=PREFETCH_CHAIN_WAIT_SECONDS).chain_result(
+                        st.session_state["bing_data"]
+                    )
+                if chain_result is None:
+                    chain_result = summarize_and_review(settings, customer_name, st.session_state["bing_data"])
+                sum_out, mgr_out, convo = chain_result
             st.success("**Summarizer Output**: " + sum_out)
             st.info("**Manager Decision**: " + mgr_out)
-            if "approved" in mgr_out.lower():
+            if is_approved(mgr_out):
                 # Store only the summarizer's output as the final summary.
                 st.session_state["final_summary"] = sum_out
                 st.success("✅ Manager approved the summary! It has now been appended to the TTS input text below.")
@@ -293,140 +252,66 @@ else:
 input_text = st.text_area("TTS Prompt:", value=default_tts_text, height=200)
 
 # BLOB & TTS setup
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
+# Shared by every rerun and session in this process
+storage = get_storage(settings.blob_connection_string, settings.blob_container_name, settings.blob_account_url)
+HISTORY_PAGE_SIZE = 20
 
-blob_service_client = BlobServiceClient.from_connection_string(BLOB_CONNECTION_STRING)
-container_client = blob_service_client.get_container_client(BLOB_CONTAINER_NAME)
+# Persistent history belongs to the signed-in identity; the Username box only names files
+history_owner = principal_from_headers(settings, st.context.headers)
+video_owner = history_owner or username
 
-if 'video_history' not in st.session_state:
-    st.session_state['video_history'] = []
-
-def _create_job_id():
-    return str(uuid.uuid4())
-
-def _authenticate(subscription_key):
-    return {'Ocp-Apim-Subscription-Key': subscription_key}
-
-def check_existing_files(username, customer_name, file_type):
-    file_prefix = f"{username}_{customer_name}_Maria_{file_type}"
-    existing_files = container_client.list_blobs(name_starts_with=file_prefix)
-    count = 1
-    for blob in existing_files:
-        blob_name = blob.name
-        parts = blob_name.split("_")
-        if len(parts) >= 3 and parts[-1].startswith(file_type):
-            number_part = parts[-1].replace(file_type, "").replace(".mp4", "").replace(".webm", "").replace(".txt", "")
-            try:
-                number = int(number_part)
-                if number >= count:
-                    count = number + 1
-            except ValueError:
-                continue
-    return count
-
-def generate_sas_token(blob_name):
-    sas_token = generate_blob_sas(
-        account_name=blob_service_client.account_name,
-        container_name=BLOB_CONTAINER_NAME,
-        blob_name=blob_name,
-        account_key=blob_service_client.credential.account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=datetime.now(timezone.utc) + timedelta(hours=1)
-    )
-    return sas_token
-
-def submit_synthesis(job_id: str, tts_text: str):
-    url = f'{SPEECH_ENDPOINT}/avatar/batchsyntheses/{job_id}?api-version={API_VERSION}'
-    header = {'Content-Type': 'application/json'}
-    header.update(_authenticate(SUBSCRIPTION_KEY))
-    payload = {
-        'synthesisConfig': {
-            "voice": "YOUR_TTS_VOICE",
-            "outputFormat": "riff-24khz-16bit-mono-pcm",
-            "wordBoundary": True
-        },
-        'customVoices': {
-            "YOUR_TTS_VOICE": "YOUR_CUSTOM_VOICE_ID"
-        },
-        "inputKind": "plainText",
-        "inputs": [
-            {"content": tts_text}
-        ],
-        "avatarConfig": {
-            "customized": True,
-            "talkingAvatarCharacter": "YOUR_AVATAR_CHARACTER",
-            "talkingAvatarStyle": "YOUR_AVATAR_STYLE",
-            "videoFormat": "mp4",
-            "videoCodec": "h264",
-            "subtitleType": "hard_embedded",
-            "backgroundColor": "#FFFFFFFF",
-            "backgroundImage": BACKGROUND_IMAGE_URL
-        }
-    }
-    resp = requests.put(url, json=payload, headers=header)
-    if resp.status_code < 400:
-        return resp.json().get("id")
-    else:
-        st.error(f"Avatar TTS error: {resp.text}")
-        return None
-
-def get_synthesis(job_id):
-    url = f'{SPEECH_ENDPOINT}/avatar/batchsyntheses/{job_id}?api-version={API_VERSION}'
-    header = _authenticate(SUBSCRIPTION_KEY)
-    try:
-        r = requests.get(url, headers=header)
-        r.raise_for_status()
-        data = r.json()
-        return data.get('outputs', {}).get('result'), data
-    except Exception as e:
-        st.error(f"Failed TTS job status: {str(e)}")
-        return None, None
-
-def upload_to_blob(local_file, blob_name):
-    bc = container_client.get_blob_client(blob_name)
-    with open(local_file, "rb") as d:
-        bc.upload_blob(d, overwrite=True)
-    return bc.url
+file_prefix = f"{username}_{customer_name}"
 
 if st.button("Generate Video"):
     if not username or not input_text or not customer_name:
         st.warning("Enter username, text, and customer name first.")
     else:
-        recording_count = check_existing_files(username, customer_name, "recordings")
-        job_id = _create_job_id()
-        if submit_synthesis(job_id, input_text):
+        recording_count = storage.next_recording_number(video_owner, customer_name)
+        job_id = create_job_id()
+        try:
+            submitted = submit_synthesis(
+                settings, job_id, input_text,
+                voice="YOUR_TTS_VOICE",
+                custom_voices={"YOUR_TTS_VOICE": "YOUR_CUSTOM_VOICE_ID"},
+                avatar_character="YOUR_AVATAR_CHARACTER",
+                avatar_style="YOUR_AVATAR_STYLE"
+            )
+        except SynthesisError as e:
+            st.error(f"Avatar TTS error: {e}")
+            submitted = None
+        if submitted:
             st.write(f"TTS Job ID: {job_id}")
             with st.spinner("Building your avatar video..."):
-                max_attempts = 60  # 60 attempts * 5 seconds = 5 minutes timeout
-                attempt = 0
-                while attempt < max_attempts:
-                    url_dl, data = get_synthesis(job_id)
-                    if url_dl and data:
-                        if data.get('status') == 'Succeeded':
-                            st.success("Video creation succeeded!")
-                            video_name = f"{username}_{customer_name}_Maria_recordings{recording_count}.mp4"
-                            with requests.get(url_dl, stream=True) as r:
-                                r.raise_for_status()
-                                with open(video_name, 'wb') as f:
-                                    for chunk in r.iter_content(chunk_size=8192):
-                                        f.write(chunk)
-                            blob_url = upload_to_blob(video_name, video_name)
-                            st.session_state['video_history'].append({
-                                "name": video_name,
-                                "url": blob_url,
-                                "sas_token": generate_sas_token(video_name)
-                            })
-                            st.download_button(
-                                label="Download Video",
-                                data=open(video_name, 'rb'),
-                                file_name=video_name,
-                                mime='video/mp4'
-                            )
-                            break
-                    attempt += 1
-                    time.sleep(5)
-                else:
+                try:
+                    # 60 attempts * 5 seconds = 5 minutes timeout
+                    _, data = wait_for_synthesis(
+                        settings, job_id, max_attempts=60,
+                        on_error=lambda e: st.error(f"Failed TTS job status: {str(e)}")
+                    )
+                except SynthesisError as e:
+                    st.error(f"Avatar TTS error: {e}")
+                except TimeoutError:
                     st.error("TTS job did not complete within the expected time.")
+                else:
+                    st.success("Video creation succeeded!")
+                    video_name = generate_filename(file_prefix, "recordings", recording_count, "mp4")
+                    local_video_path, _, _ = fetch_outputs(data, video_name, subtitles=False)
+                    blob_name, blob_url = storage.upload_video(
+                        local_video_path, video_name, video_owner, customer_name, overwrite=True
+                    )
+                    st.session_state.pop('history_page', None)
+                    st.session_state.setdefault('session_videos', []).insert(0, {
+                        "name": blob_name,
+                        "display_name": video_name,
+                        "url": blob_url,
+                        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    })
+                    st.download_button(
+                        label="Download Video",
+                        data=open(local_video_path, 'rb'),
+                        file_name=video_name,
+                        mime='video/mp4'
+                    )
 
 #############################################
 # FEEDBACK / VIDEO HISTORY
@@ -435,28 +320,60 @@ st.subheader("Feedback")
 feedback = st.text_area("Any suggestions?")
 
 if feedback and st.button("Submit Feedback"):
-    feedback_count = check_existing_files(username, customer_name, "feedback")
-    fname = f"{username}_{customer_name}_Maria_feedback{feedback_count}.txt"
-    bc = container_client.get_blob_client(fname)
-    bc.upload_blob(feedback)
+    feedback_count = storage.check_existing_files(file_prefix, "feedback")
+    fname = generate_filename(file_prefix, "feedback", feedback_count, "txt")
+    storage.upload_text(feedback, fname, tags=index_tags("feedback", video_owner, customer_name))
     st.success(f"Feedback saved: {fname}")
 
-st.subheader("Session Video History")
-if "video_history" not in st.session_state:
-    st.session_state["video_history"] = []
-
-for vid in st.session_state["video_history"]:
-    link = f"{vid['url']}?{vid['sas_token']}"
-    st.write(f"{vid['name']} - [Download]({link})")
-
+# Video history. Signed-in users get their persistent history from the blob index, one
+# page at a time; otherwise only videos created in this browser session are listed, so
+# typing someone else's name into "Username" never exposes their videos.
+st.subheader("Video History")
+if history_owner:
+    if st.session_state.get('history_user') != history_owner:
+        st.session_state['history_user'] = history_owner
+        st.session_state['history_page_tokens'] = [None]
+    page_tokens = st.session_state['history_page_tokens']
+    # Only query the blob index when the page changes; uploads clear this cache
+    history_key = (history_owner, page_tokens[-1])
+    cached_page = st.session_state.get('history_page')
+    if cached_page is None or cached_page[0] != history_key:
+        cached_page = (history_key,) + storage.list_history(
+            history_owner, page_size=HISTORY_PAGE_SIZE, continuation_token=page_tokens[-1]
+        )
+        st.session_state['history_page'] = cached_page
+    _, history_rows, next_page_token = cached_page
+else:
+    st.caption("Sign in to see your full history. Showing videos created in this session.")
+    page_tokens = [None]
+    history_rows, next_page_token = st.session_state.get('session_videos', []), None
+if not history_rows:
+    st.write("No videos yet.")
+for video in history_rows:
+    # SAS tokens are only signed for the rows on the current page
+    video_sas_url = f"{video['url']}?{storage.generate_sas_token(video['name'])}"
+    st.write(f"{video['display_name']} ({video['created']}) - [Download]({video_sas_url})")
+prev_col, next_col = st.columns(2)
+if len(page_tokens) > 1 and prev_col.button("Previous Page"):
+    page_tokens.pop()
+    st.rerun()
+if next_page_token and next_col.button("Next Page"):
+    page_tokens.append(next_page_token)
+    st.rerun()
+
+# Reset session button
 if st.button("Reset Session"):
-    st.session_state["video_history"] = []
+    st.session_state['history_page_tokens'] = [None]
+    st.session_state.pop('history_page', None)
+    st.session_state['session_videos'] = []
+    st.session_state['history_reset'] = True
+    st.rerun()
+if st.session_state.pop('history_reset', False):
     st.success("Session cleared.")
 
 st.markdown("---")
 
 # Logout button if needed
-from urllib.parse import urlencode
 if AZURE_AD_TENANT_ID:
     logout_url = f"https://login.microsoftonline.com/{AZURE_AD_TENANT_ID}/oauth2/v2.0/logout"
     post_logout_redirect = {"post_logout_redirect_uri": REDIRECT_URI}
@@ -0,0 +1,49 @@
+"""
+Headless core for the Maria avatar accelerator.
+
+Synthesis, search, agent and storage operations shared by the Streamlit apps,
+batch workers and the CLI. Submodules are imported on first attribute access so
+``import maria_core`` stays cheap; heavy SDKs (azure.storage, semantic_kernel)
+are only imported by the functions that need them.
+"""
+import importlib
+
+_EXPORTS = {
+    "Settings": "config",
+    "SynthesisError": "synthesis",
+    "create_job_id": "synthesis",
+    "submit_synthesis": "synthesis",
+    "get_synthesis": "synthesis",
+    "wait_for_synthesis": "synthesis",
+    "fetch_outputs": "synthesis",
+    "iter_json_array": "subtitles",
+    "extract_word_timestamps": "subtitles",
+    "generate_srt": "subtitles",
+    "save_srt_file": "subtitles",
+    "SearchError": "search",
+    "bing_search": "search",
+    "principal_from_headers": "identity",
+    "research_query": "search",
+    "create_summarizer_agent": "agents",
+    "create_manager_agent": "agents",
+    "run_summarizer_manager_chain": "agents",
+    "summarize_and_review": "agents",
+    "is_approved": "agents",
+    "ResearchPrefetcher": "prefetch",
+    "SpeculationBudget": "prefetch",
+    "get_prefetcher": "prefetch",
+    "VideoStorage": "storage",
+    "get_storage": "storage",
+    "generate_filename": "storage",
+    "index_tags": "storage",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{_EXPORTS[name]}"), name)
+    globals()[name] = value
+    return value
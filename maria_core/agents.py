@@ -0,0 +1,91 @@
+"""
+SummarizerAgent / ManagerAgent chain. semantic_kernel is imported inside the functions
+so that importing this module does not pull in the Semantic Kernel import graph.
+"""
+import asyncio
+
+
+def _create_chat_agent(settings, service_id, name, instructions):
+    from semantic_kernel import Kernel
+    from semantic_kernel.agents import ChatCompletionAgent
+    from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+
+    kernel = Kernel()
+    azure_chat = AzureChatCompletion(
+        service_id=service_id,
+        api_key=settings.azure_openai_api_key,
+        endpoint=settings.azure_openai_endpoint,
+        deployment_name=settings.azure_openai_deployment_name,
+        api_version=settings.azure_openai_api_version
+    )
+    kernel.add_service(azure_chat)
+    return ChatCompletionAgent(
+        service_id=service_id,
+        kernel=kernel,
+        name=name,
+        instructions=instructions
+    )
+
+
+def create_summarizer_agent(settings):
+    """
+    Agent that takes the Bing search results (around 200 words) as input and summarizes them into a concise summary of 100–150 words.
+    The summary must mention only the customer's name (from user input) and Microsoft.
+    """
+    instructions = (
+        "You are SummarizerAgent. Given the Bing search results provided (approximately 200 words), summarize the information into a concise summary of 100 to 150 words. "
+        "The summary must mention only the customer's name (from user input) and Microsoft, and exclude any other brands or competitors. "
+        "Focus on the customer's history, vision, products, and services."
+    )
+    return _create_chat_agent(settings, "summarizer_service", "SummarizerAgent", instructions)
+
+
+def create_manager_agent(settings, customer_name: str):
+    """Agent that checks the summary for unwanted brand names and approves or requests changes."""
+    manager_instructions = (
+        f"You are ManagerAgent. Check the summary provided by SummarizerAgent to ensure:\n"
+        f"1) Only the customer's name '{customer_name}' and 'Microsoft' are mentioned.\n"
+        "2) The summary is within 100 to 150 words.\n"
+        "3) If the summary is acceptable, respond 'approved'. Otherwise, indicate what needs to be changed."
+    )
+    return _create_chat_agent(settings, "manager_service", "ManagerAgent", manager_instructions)
+
+
+async def _invoke_agent(agent, user_message, label, conversation_log):
+    from semantic_kernel.contents import ChatHistory, ChatMessageContent
+    from semantic_kernel.contents.utils.author_role import AuthorRole
+
+    history = ChatHistory()
+    history.add_message(ChatMessageContent(role=AuthorRole.SYSTEM, content=agent.instructions))
+    history.add_user_message(user_message)
+    output = ""
+    async for msg in agent.invoke(history):
+        output = msg.content
+        history.add_message(msg)
+        conversation_log.append(f"[{label}] {msg.content}")
+    return output
+
+
+async def run_summarizer_manager_chain(settings, customer_name: str, raw_text: str, is_cancelled=None) -> (str, str, str):
+    """
+    1) SummarizerAgent processes the Bing search results.
+    2) ManagerAgent checks the resulting summary.
+    Returns (summarizer_output, manager_output, conversation). If ``is_cancelled`` returns
+    True once the summarizer has finished, the manager is not called and manager_output is None.
+    """
+    conversation_log = []
+    summarizer_output = await _invoke_agent(create_summarizer_agent(settings), raw_text, "Summarizer", conversation_log)
+    if is_cancelled and is_cancelled():
+        return summarizer_output, None, "\n".join(conversation_log)
+    manager_output = await _invoke_agent(create_manager_agent(settings, customer_name), summarizer_output, "Manager", conversation_log)
+    full_convo = "\n".join(conversation_log)
+    return summarizer_output, manager_output, full_convo
+
+
+def summarize_and_review(settings, customer_name: str, raw_text: str, is_cancelled=None) -> (str, str, str):
+    """Synchronous wrapper around run_summarizer_manager_chain for scripts and workers."""
+    return asyncio.run(run_summarizer_manager_chain(settings, customer_name, raw_text, is_cancelled))
+
+
+def is_approved(manager_output: str) -> bool:
+    return "approved" in manager_output.lower()
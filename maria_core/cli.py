@@ -0,0 +1,90 @@
+"""
+Command line entry point: ``python -m maria_core <command>``.
+
+Only argparse is imported up front; each command imports the core module it needs.
+"""
+import argparse
+import sys
+
+
+def _synthesize(args, settings):
+    from .storage import generate_filename, get_storage
+    from .subtitles import generate_srt, save_srt_file
+    from .synthesis import create_job_id, fetch_outputs, submit_synthesis, wait_for_synthesis
+
+    text = open(args.text_file, encoding='utf-8').read() if args.text_file else args.text
+    custom_voices = {args.voice: args.custom_voice_id} if args.custom_voice_id is not None else None
+    job_id = submit_synthesis(settings, create_job_id(), text, args.voice, custom_voices,
+                              args.avatar_character, args.avatar_style)
+    print(f"Job ID: {job_id}", file=sys.stderr)
+    _, response_data = wait_for_synthesis(settings, job_id, max_attempts=args.max_attempts)
+
+    storage = None
+    video_name = args.output
+    if args.upload:
+        storage = get_storage(settings.blob_connection_string, settings.blob_container_name, settings.blob_account_url)
+        prefix = f"{args.user}_{args.customer}"
+        recording_count = storage.next_recording_number(args.user, args.customer, args.vertical)
+        video_name = generate_filename(prefix, "recordings", recording_count, "mp4")
+    local_video_path, subtitle_data, subtitle_error = fetch_outputs(response_data, video_name, summary_path=args.summary)
+    if subtitle_error:
+        print(f"Subtitles not generated: {subtitle_error}", file=sys.stderr)
+    else:
+        save_srt_file(generate_srt(subtitle_data), f"{video_name}.srt")
+    if storage:
+        _, blob_url = storage.upload_video(local_video_path, video_name, args.user, args.customer, args.vertical)
+        print(blob_url)
+    else:
+        print(local_video_path)
+
+
+def _research(args, settings):
+    from .search import SearchError, bing_search, research_query
+
+    try:
+        data_found = bing_search(settings, research_query(args.customer_name))
+    except SearchError as e:
+        sys.exit(f"Search failed: {e}")
+    print(data_found or "No Bing results found.")
+    if args.summarize and data_found:
+        from .agents import summarize_and_review
+
+        sum_out, mgr_out, _ = summarize_and_review(settings, args.customer_name, data_found)
+        print(f"\nSummary:\n{sum_out}\n\nManager Decision:\n{mgr_out}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="maria_core", description="Maria avatar accelerator tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    synth = subparsers.add_parser("synthesize", help="Generate an avatar video from text")
+    source = synth.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text")
+    source.add_argument("--text-file")
+    synth.add_argument("--voice", default="Marie_ProNeural")
+    synth.add_argument("--custom-voice-id", default="")
+    synth.add_argument("--avatar-character", default="")
+    synth.add_argument("--avatar-style", default="")
+    synth.add_argument("--output", default="output.mp4", help="Local video path when not uploading")
+    synth.add_argument("--summary", default=None, help="Also save the job summary JSON to this path")
+    synth.add_argument("--upload", action="store_true", help="Upload the video to blob storage")
+    synth.add_argument("--user", default="cli", help="Owner recorded in the blob name and index tags")
+    synth.add_argument("--customer", default="", help="Customer recorded in the blob name and index tags")
+    synth.add_argument("--vertical", default=None, help="Industry vertical index tag")
+    synth.add_argument("--max-attempts", type=int, default=120,
+                       help="Status polls (5 seconds apart) before giving up")
+    synth.set_defaults(func=_synthesize)
+
+    research = subparsers.add_parser("research", help="Fetch Bing data about a customer")
+    research.add_argument("customer_name")
+    research.add_argument("--summarize", action="store_true", help="Run the summarizer/manager agents")
+    research.set_defaults(func=_research)
+
+    args = parser.parse_args(argv)
+
+    from .config import Settings
+    args.func(args, Settings.from_env())
+
+
+if __name__ == "__main__":
+    main()
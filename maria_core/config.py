@@ -0,0 +1,47 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class Settings:
+    """Service endpoints and credentials used by the core operations."""
+    speech_endpoint: Optional[str] = None
+    subscription_key: Optional[str] = None
+    api_version: Optional[str] = None
+    background_image_url: Optional[str] = None
+    blob_connection_string: Optional[str] = None
+    blob_container_name: Optional[str] = None
+    # Used with Azure AD auth when no connection string is configured
+    blob_account_url: Optional[str] = None
+    azure_openai_api_key: Optional[str] = None
+    azure_openai_endpoint: Optional[str] = None
+    azure_openai_deployment_name: Optional[str] = None
+    azure_openai_api_version: Optional[str] = None
+    bing_search_endpoint: str = "https://api.bing.microsoft.com/v7.0/search"
+    bing_search_api_key: Optional[str] = None
+    # Only enable behind Azure App Service authentication, which sets the identity headers
+    trust_auth_headers: bool = False
+
+    @classmethod
+    def from_env(cls, load_dotenv=True):
+        """Build settings from environment variables, optionally loading a .env file first."""
+        if load_dotenv:
+            from dotenv import load_dotenv as _load_dotenv
+            _load_dotenv(override=True)
+        return cls(
+            speech_endpoint=os.getenv("SPEECH_ENDPOINT"),
+            subscription_key=os.getenv("SUBSCRIPTION_KEY"),
+            api_version=os.getenv("API_VERSION"),
+            background_image_url=os.getenv("BACKGROUND_IMAGE_URL"),
+            blob_connection_string=os.getenv("BLOB_CONNECTION_STRING"),
+            blob_container_name=os.getenv("BLOB_CONTAINER_NAME"),
+            blob_account_url=os.getenv("BLOB_ACCOUNT_URL"),
+            azure_openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            azure_openai_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            azure_openai_deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            azure_openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+            bing_search_endpoint=os.getenv("BING_SEARCH_ENDPOINT", cls.bing_search_endpoint),
+            bing_search_api_key=os.getenv("BING_SEARCH_API_KEY"),
+            trust_auth_headers=os.getenv("TRUST_AUTH_HEADERS", "").lower() in ("1", "true", "yes"),
+        )
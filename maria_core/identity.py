@@ -0,0 +1,21 @@
+"""
+Signed-in identity for the Streamlit frontends.
+
+Persistent video history is keyed on this identity and never on the free-text "Username"
+box, which anyone can type a colleague's name into. The identity comes from the headers that
+Azure App Service authentication (Easy Auth) sets on every authenticated request. Easy Auth
+overwrites these headers, but when the app is reachable without it a client can send them
+itself, so they are only read when ``Settings.trust_auth_headers`` is enabled.
+"""
+
+PRINCIPAL_NAME_HEADER = "x-ms-client-principal-name"
+
+
+def principal_from_headers(settings, headers):
+    """Return the signed-in user name, or None when the request is not authenticated."""
+    if not settings.trust_auth_headers or not headers:
+        return None
+    for name, value in headers.items():
+        if name.lower() == PRINCIPAL_NAME_HEADER and value:
+            return value
+    return None
@@ -0,0 +1,213 @@
+"""
+Speculative research prefetch: once a customer name has settled, run the Bing search and
+the summarizer/manager chain in the background so the UI buttons can pick the result up.
+
+Work runs on a small process-wide thread pool. A new customer name for the same user
+cancels the previous speculation. Queued or debouncing work is dropped at once. Once work
+is running, cancellation is checked after the Bing search and after the summarizer. So at
+most the one request already in flight (the search, the summarizer or the manager call)
+completes, its result is discarded, and nothing further starts. Each user has a rolling
+budget of speculative runs.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple
+
+from .agents import summarize_and_review
+from .search import bing_search, research_query
+
+
+class SpeculationBudget:
+    """Rolling per-user limit on how many speculative runs may start within ``window`` seconds."""
+
+    def __init__(self, max_runs=10, window=3600):
+        self.max_runs = max_runs
+        self.window = window
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, user):
+        now = time.monotonic()
+        with self._lock:
+            runs = self._runs.setdefault(user, deque())
+            while runs and now - runs[0] > self.window:
+                runs.popleft()
+            if len(runs) >= self.max_runs:
+                return False
+            runs.append(now)
+            return True
+
+    def has_room(self, user):
+        now = time.monotonic()
+        with self._lock:
+            runs = self._runs.get(user, ())
+            return sum(1 for started in runs if now - started <= self.window) < self.max_runs
+
+
+class Speculation:
+    """Background research for one customer name. Fields are filled in as stages complete."""
+
+    def __init__(self, customer_name):
+        self.customer_name = customer_name
+        self.query = research_query(customer_name)
+        self.bing_data = None
+        self.summary = None
+        self.manager_output = None
+        self.conversation = None
+        self.status = "pending"
+        self.error = None
+        self.finished_at = None
+        self.future = None
+        self._cancelled = threading.Event()
+        self._searched = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._searched.set()
+        if self.future is not None:
+            self.future.cancel()
+        if self.status in ("pending", "searching", "summarizing"):
+            self.status = "cancelled"
+
+    def _finish(self, status, error=None):
+        """Record a terminal status that never produced results."""
+        self.status = status
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._searched.set()
+
+    @property
+    def in_progress(self):
+        return self.status in ("pending", "searching", "summarizing")
+
+    def wait_for_search(self, timeout=None):
+        """Block until the search stage has finished and return its data (None if it never ran)."""
+        self._searched.wait(timeout)
+        return self.bing_data
+
+    def wait(self, timeout=None):
+        """Block until the speculation has finished, failed or been cancelled."""
+        if self.future is not None:
+            try:
+                self.future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self
+
+    def chain_result(self, bing_data):
+        """Return (summary, manager_output, conversation) if the chain ran on ``bing_data``."""
+        if self.status == "done" and self.summary is not None and self.bing_data == bing_data:
+            return self.summary, self.manager_output, self.conversation
+        return None
+
+
+class ResearchPrefetcher:
+    """Process-wide scheduler of speculative research, one active speculation per user."""
+
+    def __init__(self, settings, debounce_seconds=1.5, budget=None, max_workers=4, retry_cooldown=60):
+        self.settings = settings
+        self.debounce_seconds = debounce_seconds
+        self.retry_cooldown = retry_cooldown
+        self.budget = budget or SpeculationBudget()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="maria-prefetch")
+        self._speculations = {}
+        self._lock = threading.Lock()
+
+    def request(self, user, customer_name, allow_retry=True):
+        """
+        Start (or keep) speculative research for ``customer_name``. A different name cancels
+        the previous speculation. For the same name the current speculation is kept, so its
+        state stays visible, unless ``allow_retry`` is set and it may be retried: a failed
+        one after ``retry_cooldown`` seconds, and a failed or over-budget one only when the
+        user's budget has room again.
+        """
+        with self._lock:
+            current = self._speculations.get(user)
+            if current and current.customer_name == customer_name and not (allow_retry and self._may_retry(user, current)):
+                return current
+            if current:
+                current.cancel()
+            speculation = Speculation(customer_name)
+            self._speculations[user] = speculation
+            if self.budget.has_room(user):
+                speculation.future = self._executor.submit(self._run, user, speculation)
+            else:
+                speculation._finish("over_budget")
+        return speculation
+
+    def _may_retry(self, user, speculation):
+        if speculation.status == "cancelled":
+            return True
+        if speculation.status == "failed":
+            return time.monotonic() - speculation.finished_at >= self.retry_cooldown and self.budget.has_room(user)
+        if speculation.status == "over_budget":
+            return self.budget.has_room(user)
+        return False
+
+    def cancel(self, user):
+        with self._lock:
+            speculation = self._speculations.pop(user, None)
+        if speculation:
+            speculation.cancel()
+
+    def _run(self, user, speculation):
+        try:
+            self._research(user, speculation)
+        finally:
+            speculation._searched.set()
+
+    def _research(self, user, speculation):
+        # Debounce: only start once the name has stayed unchanged for debounce_seconds.
+        # Waiting on the cancel event frees the worker as soon as the name changes.
+        if speculation._cancelled.wait(self.debounce_seconds):
+            return
+        if not self.budget.try_acquire(user):
+            speculation._finish("over_budget")
+            return
+        try:
+            speculation.status = "searching"
+            bing_data = bing_search(self.settings, speculation.query)
+            if speculation.cancelled:
+                return
+            speculation.bing_data = bing_data
+            speculation._searched.set()
+            if not bing_data.strip():
+                # Nothing to summarize
+                speculation.status = "done"
+                return
+
+            speculation.status = "summarizing"
+            summary, manager_output, conversation = summarize_and_review(
+                self.settings, speculation.customer_name, bing_data,
+                is_cancelled=lambda: speculation.cancelled
+            )
+            if speculation.cancelled:
+                return
+            speculation.summary = summary
+            speculation.manager_output = manager_output
+            speculation.conversation = conversation
+            speculation.status = "done"
+        except Exception as e:
+            logging.warning(f"Speculative research for {speculation.customer_name!r} failed: {e}")
+            speculation._finish("failed", e)
+
+
+_prefetchers = {}
+_prefetchers_lock = threading.Lock()
+
+
+def get_prefetcher(settings):
+    """Return the process-wide ResearchPrefetcher for these settings, creating it once."""
+    key = astuple(settings)
+    with _prefetchers_lock:
+        prefetcher = _prefetchers.get(key)
+        if prefetcher is None:
+            prefetcher = _prefetchers[key] = ResearchPrefetcher(settings)
+    return prefetcher
@@ -0,0 +1,28 @@
+import requests
+
+
+class SearchError(Exception):
+    """Raised when Bing search is not configured or the API call fails."""
+
+
+def bing_search(settings, query: str, count: int = 2) -> str:
+    """Queries Bing for the given text and returns snippet data ("" when nothing is found)."""
+    api_key = settings.bing_search_api_key
+    if not api_key or "YOUR_BING_SEARCH_API_KEY" in api_key:
+        raise SearchError("Bing Search API key not found. Provide BING_SEARCH_API_KEY in your configuration.")
+    headers = {"Ocp-Apim-Subscription-Key": api_key}
+    params = {"q": query, "count": count}
+    try:
+        response = requests.get(settings.bing_search_endpoint, headers=headers, params=params)
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        raise SearchError(f"Bing API call failed: {str(e)}") from e
+    results_text = ""
+    for item in data.get("webPages", {}).get("value", []):
+        results_text += item.get("snippet", "") + "\n"
+    return results_text.strip()
+
+
+def research_query(customer_name: str) -> str:
+    return f"{customer_name} history, recent recognition, products and services"
@@ -0,0 +1,283 @@
+"""
+Blob storage for generated videos and feedback. azure.storage.blob is imported the first
+time a client is needed.
+
+``get_storage`` hands out one ``VideoStorage`` per account/container for the whole process,
+so Streamlit reruns and concurrent sessions share the same clients and SAS cache.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+SAS_LIFETIME = timedelta(hours=1)
+# Tokens with less than this much validity left are re-signed before being handed out
+SAS_REFRESH_MARGIN = timedelta(minutes=10)
+USER_DELEGATION_KEY_LIFETIME = timedelta(days=1)
+
+# Recording blob names start with this minus the upload time in epoch milliseconds, so name
+# order (the order find_blobs_by_tags returns) is newest first
+_REVERSE_TIMESTAMP_BASE = 10 ** 13
+RECORDINGS_FOLDER = "recordings/"
+
+# Characters allowed in blob index tag values
+_TAG_UNSAFE = re.compile(r"[^A-Za-z0-9 +\-./:=_]")
+
+
+def generate_filename(prefix, file_type, count, extension):
+    return f"{prefix}_Maria_{file_type}{count}.{extension}"
+
+
+def tag_value(value):
+    """Make a value safe for use as a blob index tag value and in tag filter expressions."""
+    return _TAG_UNSAFE.sub("_", str(value))[:256]
+
+
+def recording_blob_name(video_name, created):
+    reverse_timestamp = _REVERSE_TIMESTAMP_BASE - int(created.timestamp() * 1000)
+    return f"{RECORDINGS_FOLDER}{reverse_timestamp:013d}_{video_name}"
+
+
+def recording_display_name(blob_name):
+    """Strip the folder and reverse timestamp added by recording_blob_name."""
+    if blob_name.startswith(RECORDINGS_FOLDER):
+        return blob_name[len(RECORDINGS_FOLDER):].split("_", 1)[-1]
+    return blob_name
+
+
+def user_tag(username):
+    """
+    Index tag value identifying a user. tag_value is lossy (``jane@contoso.com`` and
+    ``jane_contoso.com`` collide), so ownership is recorded as a hash of the exact username.
+    """
+    return hashlib.sha256(str(username).encode("utf-8")).hexdigest()
+
+
+def file_hash(local_filename):
+    sha256 = hashlib.sha256()
+    with open(local_filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def index_tags(kind, username, customer_name, vertical=None, content_hash=None, created=None):
+    """Blob index tags written with every upload so history can be queried server-side."""
+    created = created or datetime.now(timezone.utc)
+    tags = {
+        "kind": kind,
+        "user": user_tag(username),
+        "customer": customer_name,
+        "created": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    if vertical:
+        tags["vertical"] = vertical
+    if content_hash:
+        tags["sha256"] = content_hash
+    return {key: tag_value(value) for key, value in tags.items()}
+
+
+class SasCache:
+    """
+    Thread-safe LRU of signed read tokens, keyed by (blob name, lifetime). A cached token is
+    reused until it is within ``refresh_margin`` of expiring, then ``sign`` is called for a
+    fresh one.
+    """
+
+    def __init__(self, refresh_margin=SAS_REFRESH_MARGIN, max_entries=10000):
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, sign):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached and cached[1] - now > self.refresh_margin:
+                self._tokens.move_to_end(key)
+                return cached[0]
+        token, expiry = sign()
+        with self._lock:
+            self._tokens[key] = (token, expiry)
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > self.max_entries:
+                self._tokens.popitem(last=False)
+        return token
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+class VideoStorage:
+    """
+    Thin wrapper around the container that holds recordings and feedback.
+
+    Authenticates with a connection string, or with ``account_url`` and an Azure AD
+    credential (``DefaultAzureCredential`` when none is given). Without an account key,
+    SAS tokens are signed with a cached user delegation key.
+    """
+
+    def __init__(self, connection_string, container_name, account_url=None, credential=None):
+        self.connection_string = connection_string
+        self.container_name = container_name
+        self.account_url = account_url
+        self.credential = credential
+        self.sas_cache = SasCache()
+        self._service_client = None
+        self._container_client = None
+        self._delegation_key = None
+        self._lock = threading.Lock()
+
+    @property
+    def service_client(self):
+        if self._service_client is None:
+            with self._lock:
+                if self._service_client is None:
+                    from azure.storage.blob import BlobServiceClient
+                    if self.connection_string:
+                        self._service_client = BlobServiceClient.from_connection_string(self.connection_string)
+                    else:
+                        credential = self.credential
+                        if credential is None:
+                            from azure.identity import DefaultAzureCredential
+                            credential = DefaultAzureCredential()
+                        self._service_client = BlobServiceClient(self.account_url, credential=credential)
+        return self._service_client
+
+    @property
+    def container_client(self):
+        if self._container_client is None:
+            service_client = self.service_client
+            with self._lock:
+                if self._container_client is None:
+                    self._container_client = service_client.get_container_client(self.container_name)
+        return self._container_client
+
+    def check_existing_files(self, prefix, file_type):
+        """Return the next free sequence number for ``{prefix}_Maria_{file_type}N`` blobs."""
+        file_prefix = f"{prefix}_Maria_{file_type}"
+        existing_files = self.container_client.list_blobs(name_starts_with=file_prefix)
+        count = 1
+        for blob in existing_files:
+            parts = blob.name.split("_")
+            if len(parts) >= 3 and parts[-1].startswith(file_type):
+                number_part = parts[-1].replace(file_type, "").replace(".mp4", "").replace(".webm", "").replace(".txt", "")
+                try:
+                    number = int(number_part)
+                    if number >= count:
+                        count = number + 1
+                except ValueError:
+                    continue
+        return count
+
+    def upload_file(self, local_filename, blob_name, overwrite=False, tags=None):
+        blob_client = self.container_client.get_blob_client(blob_name)
+        with open(local_filename, "rb") as data:
+            blob_client.upload_blob(data, overwrite=overwrite, tags=tags)
+        return blob_client.url
+
+    def upload_video(self, local_filename, video_name, username, customer_name, vertical=None, overwrite=False):
+        """
+        Upload a recording tagged with its owner, customer, vertical, creation time and content
+        hash. The blob is stored under a time-ordered name (see recording_blob_name).
+        Returns (blob_name, blob_url).
+        """
+        created = datetime.now(timezone.utc)
+        tags = index_tags("recordings", username, customer_name, vertical, file_hash(local_filename), created)
+        blob_name = recording_blob_name(video_name, created)
+        return blob_name, self.upload_file(local_filename, blob_name, overwrite=overwrite, tags=tags)
+
+    def upload_text(self, text, blob_name, tags=None):
+        blob_client = self.container_client.get_blob_client(blob_name)
+        blob_client.upload_blob(text, tags=tags)
+        return blob_client.url
+
+    @staticmethod
+    def _recordings_filter(username, customer_name=None, vertical=None):
+        expression = f"\"kind\" = 'recordings' AND \"user\" = '{user_tag(username)}'"
+        if customer_name:
+            expression += f" AND \"customer\" = '{tag_value(customer_name)}'"
+        if vertical:
+            expression += f" AND \"vertical\" = '{tag_value(vertical)}'"
+        return expression
+
+    def next_recording_number(self, username, customer_name, vertical=None):
+        """Sequence number for the user's next recording for this customer, from the blob index."""
+        expression = self._recordings_filter(username, customer_name, vertical)
+        return sum(1 for _ in self.container_client.find_blobs_by_tags(expression)) + 1
+
+    def list_history(self, username, page_size=20, continuation_token=None, customer_name=None):
+        """
+        Return one page of a user's recordings as (rows, next_continuation_token), newest first.
+
+        The query runs against the blob index so the container is never scanned. The service
+        returns matches in blob name order, which recording_blob_name makes newest first.
+        """
+        # Always-true condition so the matched "created" tag is returned with each blob
+        expression = self._recordings_filter(username, customer_name) + " AND \"created\" > '0'"
+
+        pages = self.container_client.find_blobs_by_tags(expression, results_per_page=page_size).by_page(
+            continuation_token=continuation_token
+        )
+        page = next(pages, None)
+        if page is None:
+            return [], None
+        rows = [
+            {
+                "name": blob.name,
+                "display_name": recording_display_name(blob.name),
+                "url": self.container_client.get_blob_client(blob.name).url,
+                "created": (blob.tags or {}).get("created", ""),
+            }
+            for blob in page
+        ]
+        return rows, pages.continuation_token
+
+    def _user_delegation_key(self, valid_until):
+        """Return a user delegation key valid until at least ``valid_until``, requesting a new one if needed."""
+        with self._lock:
+            key = self._delegation_key
+        if key is None or datetime.fromisoformat(key.signed_expiry.replace("Z", "+00:00")) < valid_until:
+            now = datetime.now(timezone.utc)
+            key = self.service_client.get_user_delegation_key(now - timedelta(minutes=5), now + USER_DELEGATION_KEY_LIFETIME)
+            with self._lock:
+                self._delegation_key = key
+        return key
+
+    def _sign_sas_token(self, blob_name, lifetime):
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        expiry = datetime.now(timezone.utc) + lifetime
+        service_client = self.service_client
+        account_key = getattr(service_client.credential, "account_key", None)
+        sas_token = generate_blob_sas(
+            account_name=service_client.account_name,
+            container_name=self.container_name,
+            blob_name=blob_name,
+            account_key=account_key,
+            user_delegation_key=None if account_key else self._user_delegation_key(expiry),
+            permission=BlobSasPermissions(read=True),
+            expiry=expiry
+        )
+        return sas_token, expiry
+
+    def generate_sas_token(self, blob_name, lifetime=SAS_LIFETIME):
+        """Return a read SAS for the blob, reusing a cached token until it is close to expiry."""
+        return self.sas_cache.get((blob_name, lifetime), lambda: self._sign_sas_token(blob_name, lifetime))
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage(connection_string, container_name, account_url=None):
+    """Return the process-wide VideoStorage for this account and container, creating it once."""
+    key = (connection_string, account_url, container_name)
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None:
+            storage = _storages[key] = VideoStorage(connection_string, container_name, account_url=account_url)
+    return storage
@@ -0,0 +1,120 @@
+import codecs
+import json
+
+
+# Longest token that can be cut short by a chunk boundary (a \uXXXX escape)
+_MAX_PARTIAL_TOKEN = 6
+
+
+def _is_truncated(error, buffer):
+    """
+    True if a decode error can be explained by the item continuing in a later chunk. This is
+    deliberately generous near the end of the buffer (``1e`` might become ``1e5``); a real error
+    there is reported once more data arrives or the stream ends.
+    """
+    return error.msg.startswith("Unterminated string") or len(buffer) - error.pos < _MAX_PARTIAL_TOKEN
+
+
+def _ends_mid_item(error, buffer):
+    """At end of stream: True if the pending item is cut off rather than malformed."""
+    return error.msg.startswith("Unterminated string") or error.pos >= len(buffer)
+
+
+def iter_json_array(chunks):
+    """
+    Incrementally yield the items of a top-level JSON array from an iterable of byte chunks,
+    so large word-boundary files are never held in memory as a whole.
+
+    Raises ValueError for a malformed item or when the chunks end before the closing ``]``.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ""
+    pos = 0
+    started = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,\ufeff":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("Word boundary output is not a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if not _is_truncated(e, buffer):
+                    raise ValueError(f"Malformed word boundary entry: {e}") from e
+                # Incomplete item, wait for the next chunk
+                break
+            yield item
+            pos = end
+    if started and buffer[pos:].strip(" \t\r\n,"):
+        # The pending item was held back as possibly truncated; decide now that no more data is coming
+        try:
+            decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if not _ends_mid_item(e, buffer):
+                raise ValueError(f"Malformed word boundary entry: {e}") from e
+    raise ValueError("Word boundary output ended before the closing ']'")
+
+
+def extract_word_timestamps(word_boundaries):
+    """Extract word-level timestamps from Azure Speech word boundary entries."""
+    word_timestamps = []
+    for word_info in word_boundaries:
+        if 'AudioOffset' in word_info:
+            # Batch synthesis output file: offsets and durations in milliseconds
+            start = word_info['AudioOffset']
+            word_timestamps.append({
+                'start_time': start,
+                'end_time': start + word_info.get('Duration', 0),
+                'text': word_info['Text']
+            })
+        else:
+            word_timestamps.append({
+                'start_time': word_info['start'],
+                'end_time': word_info['end'],
+                'text': word_info['word']
+            })
+    return word_timestamps
+
+
+def format_srt_time(milliseconds):
+    """
+    Convert milliseconds to SRT time format (hh:mm:ss,ms).
+    """
+    seconds, ms = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02},{int(ms):03}"
+
+
+def generate_srt(subtitle_data):
+    """
+    Generate SRT file content from the subtitle data.
+    """
+    srt_content = ""
+    for idx, entry in enumerate(subtitle_data):
+        start_time = format_srt_time(entry['start_time'])
+        end_time = format_srt_time(entry['end_time'])
+        srt_content += f"{idx+1}\n"
+        srt_content += f"{start_time} --> {end_time}\n"
+        srt_content += f"{entry['text']}\n\n"
+    return srt_content
+
+
+def save_srt_file(srt_content, srt_filename):
+    with open(srt_filename, 'w', encoding='utf-8') as srt_file:
+        srt_file.write(srt_content)
+    return srt_filename
@@ -0,0 +1,159 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .subtitles import extract_word_timestamps, iter_json_array
+
+
+class SynthesisError(Exception):
+    """Raised when the batch avatar synthesis service rejects a request or a job fails."""
+
+
+def create_job_id():
+    return str(uuid.uuid4())
+
+
+def _authenticate(subscription_key):
+    return {'Ocp-Apim-Subscription-Key': subscription_key}
+
+
+def _job_url(settings, job_id):
+    return f'{settings.speech_endpoint}/avatar/batchsyntheses/{job_id}?api-version={settings.api_version}'
+
+
+def submit_synthesis(settings, job_id, input_text, voice, custom_voices=None,
+                     avatar_character='', avatar_style=''):
+    """Submit a batch avatar synthesis job and return its id."""
+    header = {'Content-Type': 'application/json'}
+    header.update(_authenticate(settings.subscription_key))
+
+    payload = {
+        'synthesisConfig': {
+            "voice": voice,
+            # Add word boundary data for timestamping
+            "outputFormat": "riff-24khz-16bit-mono-pcm",
+            "wordBoundary": True  # This adds word-level timestamping
+        },
+        'properties': {
+            # Word boundaries are delivered as a separate output file
+            "wordBoundaryEnabled": True
+        },
+        'customVoices': custom_voices or {},
+        "inputKind": "plainText",
+        "inputs": [
+            {"content": input_text},
+        ],
+        "avatarConfig": {
+            "customized": True,
+            "talkingAvatarCharacter": avatar_character,
+            "talkingAvatarStyle": avatar_style,
+            "videoFormat": "mp4",
+            "videoCodec": "h264",
+            "subtitleType": "hard_embedded",
+            "backgroundColor": "#FFFFFFFF",
+            "backgroundImage": settings.background_image_url
+        }
+    }
+
+    response = requests.put(_job_url(settings, job_id), json=payload, headers=header)
+    if response.status_code >= 400:
+        raise SynthesisError(response.text)
+    return response.json()["id"]
+
+
+def get_synthesis(settings, job_id):
+    """
+    Check the status of the synthesis job. Returns (video_url, response_data) once it has
+    succeeded and (None, None) while it is still running. Raises SynthesisError if it failed.
+    """
+    response = requests.get(_job_url(settings, job_id), headers=_authenticate(settings.subscription_key))
+    response.raise_for_status()
+    response_data = response.json()
+    if response_data['status'] == 'Succeeded':
+        return response_data['outputs']['result'], response_data
+    if response_data['status'] == 'Failed':
+        error = response_data.get('properties', {}).get('error') or response_data
+        raise SynthesisError(f"Synthesis job {job_id} failed: {error}")
+    return None, None
+
+
+def wait_for_synthesis(settings, job_id, poll_interval=5, max_attempts=None, on_error=None):
+    """
+    Poll the job until it succeeds and return (video_url, response_data). Errors fetching
+    the status are passed to ``on_error`` (logged by default) and polling continues. Raises
+    SynthesisError if the job fails and TimeoutError after ``max_attempts`` polls.
+    """
+    attempt = 0
+    while max_attempts is None or attempt < max_attempts:
+        try:
+            download_url, response_data = get_synthesis(settings, job_id)
+        except SynthesisError:
+            raise
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            else:
+                logging.warning(f"Failed to get job status: {e}")
+            download_url, response_data = None, None
+        if download_url and response_data:
+            return download_url, response_data
+        attempt += 1
+        time.sleep(poll_interval)
+    raise TimeoutError(f"Synthesis job {job_id} did not complete within {max_attempts} attempts")
+
+
+def download_file(url, local_path):
+    """Stream a synthesis output file to disk."""
+    with requests.get(url, stream=True) as r:
+        r.raise_for_status()
+        with open(local_path, 'wb') as f:
+            for chunk in r.iter_content(chunk_size=8192):
+                f.write(chunk)
+    return local_path
+
+
+def fetch_word_boundaries(url):
+    """Stream and parse the word boundary output file as it downloads."""
+    with requests.get(url, stream=True) as r:
+        r.raise_for_status()
+        return extract_word_timestamps(iter_json_array(r.iter_content(chunk_size=8192)))
+
+
+def fetch_outputs(response_data, video_name, subtitles=True, summary_path=None):
+    """
+    Fetch the output artifacts of a succeeded job concurrently: the video and, when requested,
+    the word boundaries (``subtitles``) and the job summary (written to ``summary_path``).
+    Returns (local_video_path, subtitle_data, subtitle_error). subtitle_data is None when not
+    requested or when fetching the word boundaries failed, in which case subtitle_error holds
+    the exception so callers can report it.
+    """
+    outputs = response_data.get('outputs', {})
+    boundary_url = next((url for key, url in outputs.items() if key.lower().startswith('wordboundar')), None)
+    summary_url = outputs.get('summary') if summary_path else None
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        video_future = executor.submit(download_file, outputs['result'], video_name)
+        boundary_future = executor.submit(fetch_word_boundaries, boundary_url) if subtitles and boundary_url else None
+        summary_future = executor.submit(download_file, summary_url, summary_path) if summary_url else None
+
+        local_video_path = video_future.result()
+        subtitle_data = None
+        subtitle_error = None
+        if boundary_future:
+            try:
+                subtitle_data = boundary_future.result()
+            except Exception as e:
+                logging.warning(f"Failed to fetch word boundaries: {e}")
+                subtitle_error = e
+        elif subtitles:
+            # Older responses inline the boundaries in the job status
+            subtitle_data = extract_word_timestamps(response_data.get('wordBoundary', []))
+        if summary_future:
+            try:
+                summary_future.result()
+            except Exception as e:
+                logging.warning(f"Failed to fetch job summary: {e}")
+    return local_video_path, subtitle_data, subtitle_error
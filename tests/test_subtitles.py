@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from maria_core.subtitles import extract_word_timestamps, generate_srt, iter_json_array
+
+BOUNDARIES = [
+    {"Text": "héllo \"q\" \\ x", "AudioOffset": 50, "Duration": 262, "Final": False},
+    {"Text": "a]b", "AudioOffset": 1e3, "Duration": 120, "Extra": None, "Nested": [1, {"x": True}]},
+]
+
+
+def _chunks(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def _parse(data, size=8192):
+    return list(iter_json_array(_chunks(data, size)))
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_parses_every_chunk_boundary(ensure_ascii):
+    # Chunks of every size split strings, \uXXXX escapes, multi-byte characters, numbers and literals
+    data = json.dumps(BOUNDARIES, indent=2, ensure_ascii=ensure_ascii).encode("utf-8")
+    for size in range(1, len(data) + 1):
+        assert _parse(data, size) == BOUNDARIES
+
+
+def test_empty_array():
+    assert _parse(b" [ ] ") == []
+
+
+@pytest.mark.parametrize("size", [1, 7, 8192])
+def test_truncated_stream_raises(size):
+    data = json.dumps(BOUNDARIES).encode("utf-8")[:30]
+    with pytest.raises(ValueError, match="closing"):
+        _parse(data, size)
+
+
+@pytest.mark.parametrize("data", [b"", b"[", b'[{"Text": "cut', b'[{"AudioOffset": 5'])
+def test_ended_mid_item_reports_truncation(data):
+    with pytest.raises(ValueError, match="closing"):
+        _parse(data)
+
+
+@pytest.mark.parametrize("size", [1, 7, 8192])
+@pytest.mark.parametrize("data", [
+    b'[{"a":1}, {bad}, {"b":2}]',
+    b'[{"a": 1e}]',
+    b'[{"a": 1e}',
+    b'[{"a":1} x',
+])
+def test_malformed_entry_raises(data, size):
+    with pytest.raises(ValueError, match="Malformed"):
+        _parse(data, size)
+
+
+def test_malformed_entry_detected_before_stream_ends():
+    def chunks():
+        yield b'[{"a":1}, {bad}, '
+        for _ in range(100):
+            yield b'{"b":2}, '
+        raise AssertionError("parser kept buffering past a malformed entry")
+
+    with pytest.raises(ValueError, match="Malformed"):
+        list(iter_json_array(chunks()))
+
+
+def test_not_an_array():
+    with pytest.raises(ValueError, match="not a JSON array"):
+        _parse(b'{"Text": "hi"}')
+
+
+def test_srt_from_batch_boundaries():
+    srt = generate_srt(extract_word_timestamps(BOUNDARIES))
+    assert srt.startswith('1\n00:00:00,050 --> 00:00:00,312\nhéllo "q" \\ x\n\n2\n00:00:01,000 --> 00:00:01,120\n')